@@ -14,7 +14,7 @@ from pathlib import Path
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Distance, VectorParams, PointStruct,
-    Filter, FieldCondition, MatchValue
+    Filter, FieldCondition, MatchValue, QueryRequest
 )
 import numpy as np
 from PIL import Image
@@ -126,30 +126,48 @@ class RAGService:
         Returns:
             List of floats representing the image embedding
         """
+        embeddings = await self.generate_image_embeddings([image_base64])
+        return embeddings[0]
+
+    async def generate_image_embeddings(self, images_base64: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several images in a single SigLIP-2 forward pass.
+
+        Args:
+            images_base64: Base64 encoded images
+
+        Returns:
+            One embedding per input image, in input order
+        """
         self._load_siglip()
 
         if self._siglip_model == "placeholder":
-            # Return random embedding for testing
-            return list(np.random.randn(self.IMAGE_EMBEDDING_DIM).astype(float))
+            # Return random embeddings for testing
+            return [
+                list(np.random.randn(self.IMAGE_EMBEDDING_DIM).astype(float))
+                for _ in images_base64
+            ]
 
         import torch
 
-        # Decode image
-        image_data = base64.b64decode(image_base64)
-        image = Image.open(io.BytesIO(image_data)).convert("RGB")
+        # Decode images
+        images = [
+            Image.open(io.BytesIO(base64.b64decode(image_base64))).convert("RGB")
+            for image_base64 in images_base64
+        ]
 
-        # Process image
-        inputs = self._siglip_processor(images=image, return_tensors="pt")
+        # Process images as one batch
+        inputs = self._siglip_processor(images=images, return_tensors="pt")
 
         if torch.cuda.is_available():
             inputs = {k: v.cuda() for k, v in inputs.items()}
 
-        # Generate embedding
+        # Generate embeddings
         with torch.no_grad():
             outputs = self._siglip_model.get_image_features(**inputs)
-            embedding = outputs.cpu().numpy().flatten().tolist()
+            embeddings = outputs.cpu().numpy().tolist()
 
-        return embedding
+        return embeddings
 
     async def generate_text_embedding(self, text: str) -> List[float]:
         """
@@ -210,15 +228,7 @@ class RAGService:
                 print(f"[RAGService] Image search returned {len(search_results)} results")
                 for hit in search_results:
                     print(f"[RAGService] Result: {hit.payload.get('condition')} (score: {hit.score:.3f})")
-                    results.append(SimilarCase(
-                        case_id=str(hit.id),
-                        condition=hit.payload.get("condition", "Unknown"),
-                        icd_code=hit.payload.get("icd_code", ""),
-                        similarity_score=hit.score,
-                        image_url=hit.payload.get("image_path"),
-                        description=hit.payload.get("description"),
-                        key_features=hit.payload.get("features", [])
-                    ))
+                    results.append(self._image_hit_to_case(hit))
             except Exception as e:
                 print(f"[RAGService] Image retrieval error: {e}")
 
@@ -263,6 +273,60 @@ class RAGService:
         results.sort(key=lambda x: x.similarity_score, reverse=True)
         return results[:top_k]
 
+    async def find_similar_cases_by_images(
+        self,
+        images_base64: List[str],
+        top_k: int = 5
+    ) -> List[List[SimilarCase]]:
+        """
+        Find similar cases for several images at once.
+
+        All images are embedded in one SigLIP-2 batch and searched with a
+        single Qdrant batch query.
+
+        Args:
+            images_base64: Base64 encoded images
+            top_k: Number of results to return per image
+
+        Returns:
+            One list of similar cases per input image, in input order
+        """
+        if not images_base64:
+            return []
+
+        embeddings = await self.generate_image_embeddings(images_base64)
+
+        try:
+            # Note: Collection uses unnamed default vector, not named vectors
+            batch_results = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=[
+                    QueryRequest(query=embedding, limit=top_k, with_payload=True)
+                    for embedding in embeddings
+                ]
+            )
+        except Exception as e:
+            print(f"[RAGService] Batch image retrieval error: {e}")
+            return [[] for _ in images_base64]
+
+        return [
+            [self._image_hit_to_case(hit) for hit in response.points]
+            for response in batch_results
+        ]
+
+    @staticmethod
+    def _image_hit_to_case(hit) -> SimilarCase:
+        """Convert a Qdrant image search hit into a SimilarCase."""
+        return SimilarCase(
+            case_id=str(hit.id),
+            condition=hit.payload.get("condition", "Unknown"),
+            icd_code=hit.payload.get("icd_code", ""),
+            similarity_score=hit.score,
+            image_url=hit.payload.get("image_path"),
+            description=hit.payload.get("description"),
+            key_features=hit.payload.get("features", [])
+        )
+
     async def add_scin_record(self, record: SCINRecord) -> str:
         """
         Add a record from the SCIN database to Qdrant.
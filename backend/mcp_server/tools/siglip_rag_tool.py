@@ -36,7 +36,7 @@ Author: Agentic Health Team
 Course: Google Agent Development Kit (ADK) Capstone
 """
 
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 from app.services.rag_service import RAGService
 
 # ==============================================================================
@@ -115,19 +115,65 @@ async def search_by_image(
         return {
             "success": True,
             "operation": "search_by_image",
-            "similar_cases": [
+            "similar_cases": [_format_case(case) for case in similar_cases],
+            "total_found": len(similar_cases),
+            "embedding_model": "google/siglip-base-patch16-224",
+            "embedding_dimensions": 768
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+# ==============================================================================
+# TOOL OPERATION: search_by_image_batch
+# Batched visual RAG - one SigLIP forward pass and one Qdrant batch query
+# ==============================================================================
+
+async def search_by_image_batch(
+    images_base64: List[str],
+    top_k: int = 5,
+    min_score: float = 0.7
+) -> Dict[str, Any]:
+    """
+    Search for similar dermatology cases for several images at once.
+
+    Equivalent to calling search_by_image per image, but the images are
+    embedded together and searched with a single Qdrant batch request.
+
+    Args:
+        images_base64: Base64-encoded images for similarity search
+        top_k: Number of similar cases to retrieve per image (default: 5)
+        min_score: Minimum similarity threshold 0-1 (default: 0.7)
+
+    Returns:
+        Dict containing:
+        - success: Boolean indicating operation success
+        - operation: "search_by_image_batch"
+        - results: One entry per input image (in order) with
+          similar_cases and total_found, as in search_by_image
+        - embedding_model: Model used for embedding generation
+        - embedding_dimensions: Vector dimensionality (768)
+    """
+    try:
+        batch_cases = await _get_service().find_similar_cases_by_images(
+            images_base64=images_base64,
+            top_k=top_k
+        )
+
+        return {
+            "success": True,
+            "operation": "search_by_image_batch",
+            "results": [
                 {
-                    "case_id": case.case_id,
-                    "diagnosis": case.condition,  # SimilarCase uses 'condition' not 'diagnosis'
-                    "similarity_score": case.similarity_score,
-                    "symptoms": case.key_features or [],  # Use key_features as symptoms
-                    "treatment": case.description or "",  # Use description as treatment info
-                    "visual_match_score": case.similarity_score,
-                    "icd_code": case.icd_code or ""
+                    "similar_cases": [_format_case(case) for case in similar_cases],
+                    "total_found": len(similar_cases)
                 }
-                for case in similar_cases
+                for similar_cases in batch_cases
             ],
-            "total_found": len(similar_cases),
             "embedding_model": "google/siglip-base-patch16-224",
             "embedding_dimensions": 768
         }
@@ -139,12 +185,25 @@ async def search_by_image(
         }
 
 
+def _format_case(case) -> Dict[str, Any]:
+    """Convert a SimilarCase into the tool's similar-case dict."""
+    return {
+        "case_id": case.case_id,
+        "diagnosis": case.condition,  # SimilarCase uses 'condition' not 'diagnosis'
+        "similarity_score": case.similarity_score,
+        "symptoms": case.key_features or [],  # Use key_features as symptoms
+        "treatment": case.description or "",  # Use description as treatment info
+        "visual_match_score": case.similarity_score,
+        "icd_code": case.icd_code or ""
+    }
+
+
 async def run(operation: str, **kwargs) -> Dict[str, Any]:
     """
     Main MCP tool entry point for SigLIP-based RAG.
 
     Args:
-        operation: Currently only "search_by_image" is supported
+        operation: "search_by_image" or "search_by_image_batch"
         **kwargs: Operation-specific parameters
 
     Returns:
@@ -158,6 +217,13 @@ async def run(operation: str, **kwargs) -> Dict[str, Any]:
                 min_score=kwargs.get("min_score", 0.7)
             )
 
+        elif operation == "search_by_image_batch":
+            return await search_by_image_batch(
+                images_base64=kwargs["images_base64"],
+                top_k=kwargs.get("top_k", 5),
+                min_score=kwargs.get("min_score", 0.7)
+            )
+
         else:
             return {
                 "success": False,
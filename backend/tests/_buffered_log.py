@@ -0,0 +1,107 @@
+"""
+Buffered console output for the manual test scripts.
+
+The scripts print many short progress lines. BufferedLog collects them and
+writes each batch with a single write() when flush() is called, usually at
+stage boundaries. Anything still buffered is flushed at interpreter exit.
+
+Async scripts can instead call configure_queue_logging() and use a normal
+logger: records are only enqueued on the event loop and written to stdout by a
+background listener thread.
+
+When tests run concurrently, wrap each coroutine in buffered() so its output
+(BufferedLog calls, and records on loggers with a TaskBufferFilter) is held
+back and emitted as one block when it finishes, instead of interleaving.
+
+Usage:
+    from tests._buffered_log import BufferedLog
+
+    log = BufferedLog()
+    log("STAGE 1:", stage_name)
+    log.flush()
+"""
+
+import atexit
+import logging
+import queue
+import sys
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Output held back for the task running under buffered(); None outside one
+_TASK_LINES: ContextVar[Optional[List[str]]] = ContextVar("_TASK_LINES", default=None)
+
+
+class BufferedLog:
+    """Callable drop-in for print() that writes lines in batches."""
+
+    def __init__(self):
+        self._lines: List[str] = []
+        atexit.register(self.flush)
+
+    def __call__(self, *args) -> None:
+        lines = _TASK_LINES.get()
+        (self._lines if lines is None else lines).append(" ".join(map(str, args)))
+
+    def flush(self) -> None:
+        """Write all buffered lines to stdout in one call."""
+        if not self._lines:
+            return
+        # Resolve sys.stdout at flush time so pytest's capture still applies
+        sys.stdout.write("\n".join(self._lines) + "\n")
+        self._lines.clear()
+        sys.stdout.flush()
+
+
+def configure_queue_logging(level: int = logging.INFO) -> QueueListener:
+    """
+    Route root logging through a queue to a stdout handler on a background thread.
+
+    Returns the started listener; it is also stopped (and drained) at exit.
+    """
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [QueueHandler(log_queue)]
+
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class TaskBufferFilter(logging.Filter):
+    """Divert a logger's records into the buffer of the task running under buffered()."""
+
+    # Default format is the bare message, plus the traceback when exc_info is set
+    _formatter = logging.Formatter()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        lines = _TASK_LINES.get()
+        if lines is None:
+            return True
+        lines.append(self._formatter.format(record))
+        return False
+
+
+async def buffered(coro: Awaitable[T], emit: Callable[[str], None]) -> T:
+    """
+    Await coro with its output held back, then pass it to emit as one block.
+
+    Meant for the coroutines given to asyncio.gather: each runs in its own
+    task, so each gets its own buffer.
+    """
+    lines: List[str] = []
+    token = _TASK_LINES.set(lines)
+    try:
+        return await coro
+    finally:
+        _TASK_LINES.reset(token)
+        if lines:
+            emit("\n".join(lines))
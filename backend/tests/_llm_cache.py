@@ -0,0 +1,80 @@
+"""
+On-disk memoization for LLM calls made by the manual test scripts.
+
+The scripts send the same prompts (and the same fixed test image) on every
+run, so a response keyed by a hash of its inputs can be replayed instead of
+waiting on the model again. Caching is opt-in: set LLM_CACHE=1 to enable it.
+A replayed answer can hide a model outage or an agent regression, so it is
+always off under pytest, and connectivity probes should not use it at all.
+
+Usage:
+    from tests._llm_cache import get_or_call
+
+    response = await get_or_call(
+        {"model": model, "messages": messages},
+        lambda: client.chat(model=model, messages=messages),
+    )
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "llm"
+
+
+def cache_enabled() -> bool:
+    """Caching is on only for script runs with LLM_CACHE set to a truthy value."""
+    if "PYTEST_CURRENT_TEST" in os.environ:
+        return False
+    return os.getenv("LLM_CACHE", "").lower() in ("1", "true", "yes")
+
+
+def cache_key(key_material: Dict[str, Any]) -> str:
+    """Hash the canonical JSON form of the call inputs."""
+    canonical = json.dumps(key_material, sort_keys=True, default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=20).hexdigest()
+
+
+async def get_or_call(
+    key_material: Dict[str, Any],
+    fn: Callable[[], Awaitable[Any]],
+    cacheable: Optional[Callable[[Any], bool]] = None,
+) -> Any:
+    """
+    Return the cached result for key_material, or await fn() and cache it.
+
+    Args:
+        key_material: JSON-serializable inputs that determine the response
+            (model, prompt, temperature, image, ...)
+        fn: Zero-argument callable returning an awaitable that makes the call
+        cacheable: Optional predicate on the result; results it rejects (e.g.
+            error responses) are returned but not stored
+
+    Returns:
+        The (possibly cached) result of fn()
+    """
+    if not cache_enabled():
+        return await fn()
+
+    path = CACHE_DIR / f"{cache_key(key_material)}.pkl"
+    try:
+        with path.open("rb") as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        pass
+
+    result = await fn()
+    if cacheable is not None and not cacheable(result):
+        return result
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Write-then-rename so a concurrent reader never sees a partial file
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+    return result
@@ -160,3 +160,33 @@ class TestSOAPAgent:
         )
 
         assert len(soap_agent.state.message_history) >= 2
+
+    @pytest.mark.asyncio
+    async def test_scripted_greeting_and_consent(self, soap_agent):
+        """Test scripted mode answers GREETING turns without calling Gemini."""
+        soap_agent.state.debug_scripted = True
+
+        result = await soap_agent.process_message(message="Hello", language="en")
+        assert result["stage"] == "GREETING"
+
+        result = await soap_agent.process_message(message="Yes, I agree", language="en")
+        assert result["stage"] == "SUBJECTIVE"
+        assert soap_agent.state.consent_given is True
+        assert len(soap_agent.state.message_history) == 4
+        soap_agent.client.models.generate_content.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_process_turns(self, soap_agent):
+        """Test process_turns runs the turns in order on one state."""
+        soap_agent.state.debug_scripted = True
+
+        results = await soap_agent.process_turns(
+            ["Hello", "Yes, I agree"],
+            patient_id="patient-123",
+            language="hi"
+        )
+
+        assert [r["stage"] for r in results] == ["GREETING", "SUBJECTIVE"]
+        assert soap_agent.state.patient_id == "patient-123"
+        assert soap_agent.state.language == "hi"
+        assert len(soap_agent.state.message_history) == 4
@@ -2,18 +2,41 @@
 Pytest configuration and shared fixtures.
 """
 
+import os
+
 import pytest
-import asyncio
+import pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 
+# Optional faster JSON decoding for httpx responses (Ollama, TestClient)
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
-@pytest.fixture(scope="session")
-def event_loop():
-    """Create event loop for async tests."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+
+@pytest.fixture(scope="session", autouse=True)
+def orjson_responses():
+    """Decode httpx JSON response bodies with orjson when it is installed."""
+    if not HAS_ORJSON:
+        yield
+        return
+
+    import httpx
+
+    original_json = httpx.Response.json
+
+    def _json(self, **kwargs):
+        # Keyword arguments are stdlib json.loads options; defer to httpx
+        if kwargs:
+            return original_json(self, **kwargs)
+        return orjson.loads(self.content)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(httpx.Response, "json", _json)
+        yield
 
 
 @pytest.fixture
@@ -23,20 +46,75 @@ def app_client():
     return TestClient(app)
 
 
-@pytest.fixture
-def sample_image_base64():
-    """Sample base64 image for testing."""
-    # Generate a 224x224 red image (minimum size for SigLIP)
+def _build_jpeg_b64(color: str = 'red') -> str:
+    """Encode a 224x224 solid JPEG (minimum size for SigLIP) as base64."""
     import base64
     from PIL import Image
     import io
 
-    img = Image.new('RGB', (224, 224), color='red')
+    img = Image.new('RGB', (224, 224), color=color)
     buffer = io.BytesIO()
     img.save(buffer, format='JPEG')
     return base64.b64encode(buffer.getvalue()).decode()
 
 
+# The image is deterministic, so encode it once at import time
+_SAMPLE_IMG_B64 = _build_jpeg_b64()
+
+
+@pytest.fixture(scope="session")
+def sample_image_base64():
+    """Sample base64 image for testing."""
+    return _SAMPLE_IMG_B64
+
+
+@pytest.fixture(scope="session")
+def sample_image_batch(sample_image_base64):
+    """Four distinct sample images for batched embedding tests."""
+    return [sample_image_base64] + [
+        _build_jpeg_b64(color) for color in ('pink', 'brown', 'beige')
+    ]
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def ollama_client():
+    """One Ollama client (and connection pool) shared by the whole session."""
+    import ollama
+    from app.config import get_settings
+
+    client = ollama.AsyncClient(host=get_settings().ollama_base_url)
+    yield client
+    await client._client.aclose()
+
+
+@pytest.fixture(scope="session")
+def base_agent():
+    """Live SOAP agent whose Gemini client and tools are built once (needs GOOGLE_API_KEY)."""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key or api_key == "your_api_key_here":
+        pytest.skip("GOOGLE_API_KEY not set")
+
+    from agent.soap_agent import SOAPAgent
+
+    return SOAPAgent()
+
+
+@pytest.fixture
+def agent(base_agent):
+    """
+    Per-test agent with a fresh consultation state.
+
+    The copy shares the session agent's Gemini client and MCP tools, so a
+    test that changes the stage or enables scripted mode can't leak it.
+    """
+    import copy
+    from agent.soap_agent import ConsultationState
+
+    test_agent = copy.copy(base_agent)
+    test_agent.state = ConsultationState()
+    return test_agent
+
+
 @pytest.fixture
 def mock_ollama_client():
     """Mock Ollama client for agent tests."""
@@ -8,15 +8,28 @@ Run with:
 """
 import asyncio
 import sys
-import base64
 from pathlib import Path
 from io import BytesIO
 
+# SIMD-accelerated base64 when available; same API as the stdlib module
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import ollama
 from app.config import get_settings
+from tests._buffered_log import BufferedLog, buffered
+
+# Optional faster event loop for the script entry point
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
 
 # Try to import PIL for image creation
 try:
@@ -25,57 +38,108 @@ try:
 except ImportError:
     HAS_PIL = False
 
+# Output is batched and written once per test
+log = BufferedLog()
 
-def create_test_image():
-    """Create a simple test image (red square simulating a rash)."""
-    if not HAS_PIL:
-        return None
+# get_settings() is lru_cached; resolve it once and pass it to each test
+SETTINGS = get_settings()
+
+# Caps concurrent chat requests so a small Ollama server isn't oversubscribed
+_OLLAMA_SLOTS = asyncio.Semaphore(2)
+
+# Only a preview is printed, so stop streaming once this much text arrives
+_PREVIEW_CHARS = 320
+
+# Upper bound on the encoded test image, to catch payload-size regressions
+_MAX_TEST_IMAGE_BYTES = 8 * 1024
 
-    # Create a 512x512 image with a red patch
-    img = Image.new('RGB', (512, 512), color='beige')
+
+def _build_test_image():
+    """Render the test image (red patch simulating a rash) as base64 JPEG."""
+    # Create a 224x224 image (the vision encoder's native input) with a red patch
+    img = Image.new('RGB', (224, 224), color='beige')
     draw = ImageDraw.Draw(img)
 
     # Draw a red irregular patch (simulating a rash)
-    draw.ellipse([150, 150, 350, 350], fill='red', outline='darkred', width=3)
-    draw.ellipse([180, 180, 300, 280], fill='pink')
+    draw.ellipse([66, 66, 153, 153], fill='red', outline='darkred', width=1)
+    draw.ellipse([79, 79, 131, 122], fill='pink')
 
     # Convert to base64
     buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode()
+    img.save(buffered, format="JPEG", quality=80, subsampling=2)
+    jpeg = buffered.getvalue()
+    assert len(jpeg) < _MAX_TEST_IMAGE_BYTES, f"Test image grew to {len(jpeg)} bytes"
+    return base64.b64encode(jpeg).decode()
 
 
-async def test_ollama_connection():
-    """Test basic Ollama server connection."""
-    print("\n" + "=" * 70)
-    print("TEST 1: Ollama Server Connection")
-    print("=" * 70)
+# The image is deterministic, so encode it once at import
+_CACHED_IMG_B64 = _build_test_image() if HAS_PIL else None
 
-    settings = get_settings()
+
+def create_test_image():
+    """Return the cached test image, or None when PIL is unavailable."""
+    return _CACHED_IMG_B64
+
+
+def _model_name(m) -> str:
+    """Name of a listed model, whether the client returned objects or dicts."""
+    return (
+        getattr(m, 'model', None)
+        or getattr(m, 'name', None)
+        or (isinstance(m, dict) and (m.get('model') or m.get('name')))
+        or 'unknown'
+    )
+
+
+async def _stream_chat(client, **kwargs):
+    """Stream a chat response and return its text, stopping after the preview.
+
+    Always a live call: this script checks that Ollama answers, so a cached
+    reply would defeat it.
+    """
+    stream = await client.chat(stream=True, **kwargs)
+    collected = []
+    received = 0
+    try:
+        async for part in stream:
+            chunk = part['message']['content']
+            collected.append(chunk)
+            received += len(chunk)
+            if received > _PREVIEW_CHARS:
+                break
+    finally:
+        # Close the generator so the HTTP stream is released right away
+        await stream.aclose()
+    return "".join(collected)
+
+
+async def test_ollama_connection(settings=SETTINGS):
+    """Test basic Ollama server connection."""
+    log("\n" + "=" * 70)
+    log("TEST 1: Ollama Server Connection")
+    log("=" * 70)
 
     try:
         client = ollama.AsyncClient(host=settings.ollama_base_url)
         models = await client.list()
-        print(f"✓ Connected to Ollama at {settings.ollama_base_url}")
+        log(f"✓ Connected to Ollama at {settings.ollama_base_url}")
         model_count = len(models.models) if hasattr(models, 'models') else len(models['models'])
-        print(f"✓ Found {model_count} available models")
+        log(f"✓ Found {model_count} available models")
         return client, models
     except Exception as e:
-        print(f"✗ Failed to connect to Ollama: {e}")
-        print(f"  Make sure Ollama is running: ollama serve")
+        log(f"✗ Failed to connect to Ollama: {e}")
+        log(f"  Make sure Ollama is running: ollama serve")
         return None, None
 
 
-async def test_medgemma_availability(models):
+async def test_medgemma_availability(models, settings=SETTINGS):
     """Test if MedGemma model is available."""
-    print("\n" + "=" * 70)
-    print("TEST 2: MedGemma Model Availability")
-    print("=" * 70)
-
-    settings = get_settings()
+    log("\n" + "=" * 70)
+    log("TEST 2: MedGemma Model Availability")
+    log("=" * 70)
 
     if models is None:
-        print("✗ Skipped (server not connected)")
+        log("✗ Skipped (server not connected)")
         return False
 
     # Handle both dict and object responses
@@ -85,146 +149,113 @@ async def test_medgemma_availability(models):
         else:
             model_list = models['models']
 
-        # Extract model names
-        model_names = []
-        for m in model_list:
-            if hasattr(m, 'model'):
-                model_names.append(m.model)
-            elif hasattr(m, 'name'):
-                model_names.append(m.name)
-            else:
-                model_names.append(m.get('model', m.get('name', 'unknown')))
+        # Set of names: the configured and fallback model checks are O(1)
+        model_names = frozenset(_model_name(m) for m in model_list)
     except Exception as e:
-        print(f"✗ Error parsing models: {e}")
+        log(f"✗ Error parsing models: {e}")
         return False
 
-    print(f"\nLooking for MedGemma models:")
-    medgemma_models = [m for m in model_names if 'medgemma' in m.lower()]
+    log(f"\nLooking for MedGemma models:")
+    medgemma_models = sorted(m for m in model_names if 'medgemma' in m.lower())
 
     if medgemma_models:
-        print(f"✓ Found {len(medgemma_models)} MedGemma model(s):")
+        log(f"✓ Found {len(medgemma_models)} MedGemma model(s):")
         for model in medgemma_models:
             marker = "✓" if model == settings.ollama_medgemma_model else " "
-            print(f"  {marker} {model}")
+            log(f"  {marker} {model}")
     else:
-        print("✗ No MedGemma models found")
+        log("✗ No MedGemma models found")
 
     # Check for configured model
     if settings.ollama_medgemma_model in model_names:
-        print(f"\n✓ Configured model '{settings.ollama_medgemma_model}' is available")
+        log(f"\n✓ Configured model '{settings.ollama_medgemma_model}' is available")
         return True
     else:
-        print(f"\n✗ Configured model '{settings.ollama_medgemma_model}' NOT found!")
-        print(f"\nTo install it, run:")
-        print(f"  ollama pull {settings.ollama_medgemma_model}")
+        log(f"\n✗ Configured model '{settings.ollama_medgemma_model}' NOT found!")
+        log(f"\nTo install it, run:")
+        log(f"  ollama pull {settings.ollama_medgemma_model}")
 
         # Check for fallback
         if settings.ollama_vision_model in model_names:
-            print(f"\nNote: Fallback vision model '{settings.ollama_vision_model}' is available")
+            log(f"\nNote: Fallback vision model '{settings.ollama_vision_model}' is available")
 
         return False
 
 
-async def test_vision_without_image(client):
+async def test_vision_without_image(client, settings=SETTINGS):
     """Test MedGemma with a text-only medical query."""
-    print("\n" + "=" * 70)
-    print("TEST 3: Text-Only Medical Query")
-    print("=" * 70)
-
-    settings = get_settings()
+    log("\n" + "=" * 70)
+    log("TEST 3: Text-Only Medical Query")
+    log("=" * 70)
 
     if client is None:
-        print("✗ Skipped (server not connected)")
+        log("✗ Skipped (server not connected)")
         return False
 
     medical_query = "Describe the typical appearance of eczema on skin."
 
-    print(f"\nSending text query to {settings.ollama_medgemma_model}...")
-    print(f"Query: \"{medical_query}\"")
+    log(f"\nSending text query to {settings.ollama_medgemma_model}...")
+    log(f"Query: \"{medical_query}\"")
 
     try:
-        response = await client.chat(
-            model=settings.ollama_medgemma_model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": medical_query
-                }
-            ],
-            options={"temperature": 0.3}
-        )
-
-        response_text = response['message']['content']
-        print(f"\n✓ Response received ({len(response_text)} chars):")
-        print(f"  {response_text[:300]}..." if len(response_text) > 300 else f"  {response_text}")
+        async with _OLLAMA_SLOTS:
+            response_text = await _stream_chat(
+                client,
+                model=settings.ollama_medgemma_model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": medical_query
+                    }
+                ],
+                options={"temperature": 0.3}
+            )
+
+        log(f"\n✓ Response received ({len(response_text)} chars streamed):")
+        log(f"  {response_text[:300]}..." if len(response_text) > 300 else f"  {response_text}")
 
         return True
 
     except Exception as e:
-        print(f"\n✗ Text query failed: {e}")
+        log(f"\n✗ Text query failed: {e}")
         return False
 
 
-async def test_vision_with_image(client):
+async def test_vision_with_image(client, settings=SETTINGS):
     """Test MedGemma with an image (if PIL available)."""
-    print("\n" + "=" * 70)
-    print("TEST 4: Image Analysis (Vision)")
-    print("=" * 70)
-
-    settings = get_settings()
+    log("\n" + "=" * 70)
+    log("TEST 4: Image Analysis (Vision)")
+    log("=" * 70)
 
     if client is None:
-        print("✗ Skipped (server not connected)")
+        log("✗ Skipped (server not connected)")
         return False
 
     if not HAS_PIL:
-        print("✗ Skipped (PIL not available to create test image)")
-        print("  Install with: uv pip install Pillow")
+        log("✗ Skipped (PIL not available to create test image)")
+        log("  Install with: uv pip install Pillow")
         return None  # Not a failure, just skipped
 
     # Create test image
-    print("\nCreating test image (simulated skin rash)...")
+    log("\nCreating test image (simulated skin rash)...")
     image_base64 = create_test_image()
 
     if not image_base64:
-        print("✗ Failed to create test image")
+        log("✗ Failed to create test image")
         return False
 
-    print("✓ Test image created")
+    log("✓ Test image created")
 
     medical_prompt = "Analyze this skin image. What do you observe? Describe any visible characteristics."
 
-    print(f"\nSending image + prompt to {settings.ollama_medgemma_model}...")
-    print(f"Prompt: \"{medical_prompt}\"")
+    log(f"\nSending image + prompt to {settings.ollama_medgemma_model}...")
+    log(f"Prompt: \"{medical_prompt}\"")
 
     try:
-        response = await client.chat(
-            model=settings.ollama_medgemma_model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": medical_prompt,
-                    "images": [image_base64]
-                }
-            ],
-            options={"temperature": 0.3}
-        )
-
-        response_text = response['message']['content']
-        print(f"\n✓ Vision response received ({len(response_text)} chars):")
-        print(f"  {response_text[:300]}..." if len(response_text) > 300 else f"  {response_text}")
-
-        return True
-
-    except Exception as e:
-        print(f"\n✗ Vision analysis failed: {e}")
-        print(f"\nNote: Some MedGemma models may not support vision.")
-        print(f"      Trying fallback model '{settings.ollama_vision_model}'...")
-
-        # Try with fallback
-        try:
-            response = await client.chat(
-                model=settings.ollama_vision_model,
+        async with _OLLAMA_SLOTS:
+            response_text = await _stream_chat(
+                client,
+                model=settings.ollama_medgemma_model,
                 messages=[
                     {
                         "role": "user",
@@ -235,67 +266,107 @@ async def test_vision_with_image(client):
                 options={"temperature": 0.3}
             )
 
-            response_text = response['message']['content']
-            print(f"\n✓ Fallback vision response received ({len(response_text)} chars):")
-            print(f"  {response_text[:300]}..." if len(response_text) > 300 else f"  {response_text}")
+        log(f"\n✓ Vision response received ({len(response_text)} chars streamed):")
+        log(f"  {response_text[:300]}..." if len(response_text) > 300 else f"  {response_text}")
+
+        return True
+
+    except Exception as e:
+        log(f"\n✗ Vision analysis failed: {e}")
+        log(f"\nNote: Some MedGemma models may not support vision.")
+        log(f"      Trying fallback model '{settings.ollama_vision_model}'...")
+
+        # Try with fallback
+        try:
+            async with _OLLAMA_SLOTS:
+                response_text = await _stream_chat(
+                    client,
+                    model=settings.ollama_vision_model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": medical_prompt,
+                            "images": [image_base64]
+                        }
+                    ],
+                    options={"temperature": 0.3}
+                )
+
+            log(f"\n✓ Fallback vision response received ({len(response_text)} chars streamed):")
+            log(f"  {response_text[:300]}..." if len(response_text) > 300 else f"  {response_text}")
 
             return True
 
         except Exception as e2:
-            print(f"\n✗ Fallback also failed: {e2}")
+            log(f"\n✗ Fallback also failed: {e2}")
             return False
 
 
-async def main():
-    """Run all tests."""
-    print("\n" + "=" * 70)
-    print("MEDGEMMA VISION MODEL TEST")
-    print("=" * 70)
-
+async def run_tests():
+    """Run the Ollama probes and return (name, result) pairs."""
     results = []
 
     # Test 1: Connection
     client, models = await test_ollama_connection()
     results.append(("Ollama Connection", client is not None))
+    log.flush()
 
     # Test 2: Model availability
     if client:
         model_available = await test_medgemma_availability(models)
         results.append(("MedGemma Availability", model_available))
+        log.flush()
 
-        # Test 3: Text query
+        # Tests 3 & 4: Text and vision queries are independent,
+        # so run them concurrently on the same client; each test's output is
+        # held back and logged as one block so the two don't interleave
         if model_available:
-            text_works = await test_vision_without_image(client)
+            text_works, vision_result = await asyncio.gather(
+                buffered(test_vision_without_image(client), log),
+                buffered(test_vision_with_image(client), log),
+            )
             results.append(("Text Medical Query", text_works))
+            if vision_result is not None:
+                results.append(("Image Analysis", vision_result))
+
+    log.flush()
+    return results
 
-            # Test 4: Vision query
-            if text_works:
-                vision_result = await test_vision_with_image(client)
-                if vision_result is not None:
-                    results.append(("Image Analysis", vision_result))
+
+def main():
+    """Run all tests and print a summary."""
+    log("\n" + "=" * 70)
+    log("MEDGEMMA VISION MODEL TEST")
+    log("=" * 70)
+    log.flush()
+
+    run = uvloop.run if HAS_UVLOOP else asyncio.run
+    results = run(run_tests())
 
     # Summary
-    print("\n" + "=" * 70)
-    print("TEST SUMMARY")
-    print("=" * 70)
+    log("\n" + "=" * 70)
+    log("TEST SUMMARY")
+    log("=" * 70)
 
     for i, (name, result) in enumerate(results, 1):
         status = "✓ PASS" if result else "✗ FAIL"
-        print(f"{i}. {name}: {status}")
+        log(f"{i}. {name}: {status}")
 
     passed = sum(1 for _, r in results if r)
     total = len(results)
 
-    print(f"\nTotal: {passed}/{total} tests passed")
+    log(f"\nTotal: {passed}/{total} tests passed")
 
     if passed == total:
-        print("\n✓ All tests passed! MedGemma is working correctly.")
-        return 0
+        log("\n✓ All tests passed! MedGemma is working correctly.")
+        exit_code = 0
     else:
-        print("\n✗ Some tests failed. Check the output above for details.")
-        return 1
+        log("\n✗ Some tests failed. Check the output above for details.")
+        exit_code = 1
+
+    log.flush()
+    return exit_code
 
 
 if __name__ == "__main__":
-    exit_code = asyncio.run(main())
-    sys.exit(exit_code)
+    sys.exit(main())
@@ -5,49 +5,109 @@ Test script to verify Ollama connection and gpt-oss:20b model.
 Run with:
     cd backend
     uv run python tests/test_ollama_connection.py
+
+Tests 3 and 4 are sent concurrently. Start the server with
+OLLAMA_NUM_PARALLEL=2 so it actually serves both requests in parallel:
+    OLLAMA_NUM_PARALLEL=2 ollama serve
 """
 import asyncio
+import functools
+import logging
 import sys
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import httpx
 import ollama
 from app.config import get_settings
+from tests._buffered_log import TaskBufferFilter, buffered
+
+logger = logging.getLogger(__name__)
+# Tests 3 and 4 run concurrently; each one's records are logged as one block
+logger.addFilter(TaskBufferFilter())
+
+_SEP = "=" * 70
+
+# get_settings() is lru_cached; resolve it once and pass it to each test
+SETTINGS = get_settings()
+
+# Shared client so every test reuses the same HTTP connection pool
+_CLIENT: ollama.AsyncClient | None = None
+
+
+def get_client(host: str) -> ollama.AsyncClient:
+    """Return the shared Ollama client, creating it on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        # Extra kwargs are forwarded to the underlying httpx.AsyncClient
+        _CLIENT = ollama.AsyncClient(
+            host=host,
+            timeout=httpx.Timeout(300, connect=10),
+            limits=httpx.Limits(
+                max_keepalive_connections=40,
+                max_connections=100,
+                keepalive_expiry=30.0,
+            ),
+        )
+    return _CLIENT
 
 
-async def test_ollama_connection():
-    """Test basic Ollama server connection."""
-    print("\n" + "=" * 70)
-    print("TEST 1: Ollama Server Connection")
-    print("=" * 70)
+async def close_client():
+    """Close the shared client's connection pool."""
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT._client.aclose()
+        _CLIENT = None
+
+
+def _model_name(m) -> str:
+    """Name of a listed model, whether the client returned objects or dicts."""
+    return (
+        getattr(m, 'model', None)
+        or getattr(m, 'name', None)
+        or (isinstance(m, dict) and (m.get('model') or m.get('name')))
+        or 'unknown'
+    )
 
-    settings = get_settings()
+
+async def test_ollama_connection(settings=SETTINGS):
+    """Test basic Ollama server connection."""
+    logger.info("\n%s\nTEST 1: Ollama Server Connection\n%s", _SEP, _SEP)
 
     try:
-        client = ollama.AsyncClient(host=settings.ollama_base_url)
+        client = get_client(settings.ollama_base_url)
         models = await client.list()
-        print(f"✓ Connected to Ollama at {settings.ollama_base_url}")
+        logger.info("✓ Connected to Ollama at %s", settings.ollama_base_url)
         model_count = len(models.models) if hasattr(models, 'models') else len(models['models'])
-        print(f"✓ Found {model_count} available models")
+        logger.info("✓ Found %d available models", model_count)
+
+        # Load the chat model once and keep it resident for the later tests
+        try:
+            await client.generate(
+                model=settings.ollama_chat_model,
+                prompt=" ",
+                options={"num_predict": 1},
+                keep_alive="10m"
+            )
+            logger.info("✓ Warmed up %s", settings.ollama_chat_model)
+        except Exception as e:
+            logger.info("  Warm-up skipped: %s", e)
+
         return client, models
     except Exception as e:
-        print(f"✗ Failed to connect to Ollama: {e}")
-        print(f"  Make sure Ollama is running: ollama serve")
+        logger.info("✗ Failed to connect to Ollama: %s", e)
+        logger.info("  Make sure Ollama is running: ollama serve")
         return None, None
 
 
-async def test_model_availability(models):
+async def test_model_availability(models, settings=SETTINGS):
     """Test if gpt-oss:20b is available."""
-    print("\n" + "=" * 70)
-    print("TEST 2: Model Availability (gpt-oss:20b)")
-    print("=" * 70)
-
-    settings = get_settings()
+    logger.info("\n%s\nTEST 2: Model Availability (gpt-oss:20b)\n%s", _SEP, _SEP)
 
     if models is None:
-        print("✗ Skipped (server not connected)")
+        logger.info("✗ Skipped (server not connected)")
         return False
 
     # Handle both dict and object responses
@@ -58,50 +118,39 @@ async def test_model_availability(models):
             model_list = models['models']
 
         # Extract model names (handle both dict and object)
-        model_names = []
-        for m in model_list:
-            if hasattr(m, 'model'):
-                model_names.append(m.model)
-            elif hasattr(m, 'name'):
-                model_names.append(m.name)
-            else:
-                model_names.append(m.get('model', m.get('name', 'unknown')))
+        model_names = frozenset(_model_name(m) for m in model_list)
     except Exception as e:
-        print(f"✗ Error parsing models: {e}")
-        print(f"  Models structure: {models}")
+        logger.info("✗ Error parsing models: %s", e)
+        logger.info("  Models structure: %s", models)
         return False
 
-    print(f"\nAvailable models:")
-    for name in model_names:
+    logger.info("\nAvailable models:")
+    for name in sorted(model_names):
         marker = "✓" if name == settings.ollama_chat_model else " "
-        print(f"  {marker} {name}")
+        logger.info("  %s %s", marker, name)
 
     if settings.ollama_chat_model in model_names:
-        print(f"\n✓ Model '{settings.ollama_chat_model}' is available")
+        logger.info("\n✓ Model '%s' is available", settings.ollama_chat_model)
         return True
     else:
-        print(f"\n✗ Model '{settings.ollama_chat_model}' NOT found!")
-        print(f"\nTo install it, run:")
-        print(f"  ollama pull {settings.ollama_chat_model}")
+        logger.info("\n✗ Model '%s' NOT found!", settings.ollama_chat_model)
+        logger.info("\nTo install it, run:")
+        logger.info("  ollama pull %s", settings.ollama_chat_model)
         return False
 
 
-async def test_chat_completion(client):
+async def test_chat_completion(client, settings=SETTINGS):
     """Test chat completion with gpt-oss:20b."""
-    print("\n" + "=" * 70)
-    print("TEST 3: Chat Completion")
-    print("=" * 70)
-
-    settings = get_settings()
+    logger.info("\n%s\nTEST 3: Chat Completion\n%s", _SEP, _SEP)
 
     if client is None:
-        print("✗ Skipped (server not connected)")
+        logger.info("✗ Skipped (server not connected)")
         return False
 
     test_prompt = "Say 'Hello from the medical kiosk backend!' in one sentence."
 
-    print(f"\nSending test prompt to {settings.ollama_chat_model}...")
-    print(f"Prompt: \"{test_prompt}\"")
+    logger.info("\nSending test prompt to %s...", settings.ollama_chat_model)
+    logger.info("Prompt: \"%s\"", test_prompt)
 
     try:
         response = await client.chat(
@@ -116,32 +165,28 @@ async def test_chat_completion(client):
         )
 
         response_text = response['message']['content']
-        print(f"\n✓ Response received:")
-        print(f"  \"{response_text}\"")
+        logger.info("\n✓ Response received:")
+        logger.info("  \"%s\"", response_text)
 
         return True
 
     except Exception as e:
-        print(f"\n✗ Chat completion failed: {e}")
+        logger.info("\n✗ Chat completion failed: %s", e)
         return False
 
 
-async def test_medical_prompt(client):
+async def test_medical_prompt(client, settings=SETTINGS):
     """Test with a medical-related prompt."""
-    print("\n" + "=" * 70)
-    print("TEST 4: Medical Context Understanding")
-    print("=" * 70)
-
-    settings = get_settings()
+    logger.info("\n%s\nTEST 4: Medical Context Understanding\n%s", _SEP, _SEP)
 
     if client is None:
-        print("✗ Skipped (server not connected)")
+        logger.info("✗ Skipped (server not connected)")
         return False
 
     medical_prompt = "A patient reports a red, itchy rash on their arm for 3 days. What information would be helpful to gather?"
 
-    print(f"\nSending medical prompt to {settings.ollama_chat_model}...")
-    print(f"Prompt: \"{medical_prompt}\"")
+    logger.info("\nSending medical prompt to %s...", settings.ollama_chat_model)
+    logger.info("Prompt: \"%s\"", medical_prompt)
 
     try:
         response = await client.chat(
@@ -160,47 +205,50 @@ async def test_medical_prompt(client):
         )
 
         response_text = response['message']['content']
-        print(f"\n✓ Response received:")
-        print(f"  {response_text[:200]}..." if len(response_text) > 200 else f"  {response_text}")
+        logger.info("\n✓ Response received:")
+        if logger.isEnabledFor(logging.INFO):
+            if len(response_text) > 200:
+                logger.info("  %s...", response_text[:200])
+            else:
+                logger.info("  %s", response_text)
 
         return True
 
     except Exception as e:
-        print(f"\n✗ Medical prompt test failed: {e}")
+        logger.info("\n✗ Medical prompt test failed: %s", e)
         return False
 
 
 async def main():
     """Run all tests."""
-    print("\n" + "=" * 70)
-    print("OLLAMA GPT-OSS CONNECTION TEST")
-    print("=" * 70)
+    logger.info("\n%s\nOLLAMA GPT-OSS CONNECTION TEST\n%s", _SEP, _SEP)
 
     results = []
 
-    # Test 1: Connection
-    client, models = await test_ollama_connection()
-    results.append(client is not None)
-
-    # Test 2: Model availability
-    if client:
-        model_available = await test_model_availability(models)
-        results.append(model_available)
-
-        # Test 3: Basic chat
-        if model_available:
-            chat_works = await test_chat_completion(client)
-            results.append(chat_works)
-
-            # Test 4: Medical prompt
-            if chat_works:
-                medical_works = await test_medical_prompt(client)
-                results.append(medical_works)
+    try:
+        # Test 1: Connection
+        client, models = await test_ollama_connection()
+        results.append(client is not None)
+
+        # Test 2: Model availability
+        if client:
+            model_available = await test_model_availability(models)
+            results.append(model_available)
+
+            # Tests 3 & 4: Basic chat and medical prompt are independent,
+            # so run them concurrently on the shared client
+            if model_available:
+                emit = functools.partial(logger.info, "%s")
+                chat_works, medical_works = await asyncio.gather(
+                    buffered(test_chat_completion(client), emit),
+                    buffered(test_medical_prompt(client), emit),
+                )
+                results.extend([chat_works, medical_works])
+    finally:
+        await close_client()
 
     # Summary
-    print("\n" + "=" * 70)
-    print("TEST SUMMARY")
-    print("=" * 70)
+    logger.info("\n%s\nTEST SUMMARY\n%s", _SEP, _SEP)
 
     test_names = [
         "Ollama Connection",
@@ -211,21 +259,22 @@ async def main():
 
     for i, (name, result) in enumerate(zip(test_names[:len(results)], results), 1):
         status = "✓ PASS" if result else "✗ FAIL"
-        print(f"{i}. {name}: {status}")
+        logger.info("%d. %s: %s", i, name, status)
 
     passed = sum(results)
     total = len(results)
 
-    print(f"\nTotal: {passed}/{total} tests passed")
+    logger.info("\nTotal: %d/%d tests passed", passed, total)
 
     if passed == total:
-        print("\n✓ All tests passed! gpt-oss:20b is working correctly.")
+        logger.info("\n✓ All tests passed! gpt-oss:20b is working correctly.")
         return 0
     else:
-        print("\n✗ Some tests failed. Check the output above for details.")
+        logger.info("\n✗ Some tests failed. Check the output above for details.")
         return 1
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     exit_code = asyncio.run(main())
     sys.exit(exit_code)
@@ -0,0 +1,159 @@
+"""
+Shared fixtures for MCP tool tests.
+"""
+
+import asyncio
+
+import pytest_asyncio
+
+
+class ToolResults(dict):
+    """Cached tool results that re-raise a call's exception when accessed."""
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, BaseException):
+            raise value
+        return value
+
+
+async def _warm_up_models(client):
+    """
+    Load the Ollama models used by the tools and keep them resident.
+
+    An empty prompt only loads the model; keep_alive stops Ollama from
+    evicting it between requires_ollama tests and across quick re-runs.
+    """
+    from app.config import get_settings
+
+    settings = get_settings()
+    await asyncio.gather(
+        *(
+            client.generate(model=model, prompt="", keep_alive="10m")
+            for model in (settings.ollama_chat_model, settings.ollama_medgemma_model)
+        ),
+        return_exceptions=True,
+    )
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def created_consultation():
+    """Create the shared test consultation exactly once."""
+    from mcp_server.tools import consultation_tool
+
+    return await consultation_tool.run(
+        operation="create",
+        patient_id="test_patient_123",
+        language="en"
+    )
+
+
+async def _gather_results(calls):
+    """Await all calls concurrently and key their results by name."""
+    results = await asyncio.gather(*calls.values(), return_exceptions=True)
+    return ToolResults(zip(calls, results))
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def cpu_tool_results(created_consultation):
+    """
+    Run every CPU-only MCP tool call once, concurrently.
+
+    Kept separate from ``tool_results`` so the ``cpu`` xdist group never
+    loads Ollama models or opens the embedded Qdrant store.
+    """
+    from mcp_server.tools import consultation_tool, safety_tool, speech_tool
+
+    return await _gather_results({
+        "get_consultation": consultation_tool.run(
+            operation="get",
+            consultation_id=created_consultation.get("consultation_id", "")
+        ),
+        "check_message": safety_tool.run(
+            operation="check_message",
+            message="I have a mild rash",
+            language="en"
+        ),
+        "check_critical": safety_tool.run(
+            operation="check_critical",
+            conditions=["Contact Dermatitis", "Eczema"]
+        ),
+        "synthesize": speech_tool.run(
+            operation="synthesize",
+            text="Hello, how can I help you today?",
+            language="en"
+        ),
+    })
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def tool_results(sample_image_base64, ollama_client):
+    """
+    Run every independent Ollama MCP tool call once, concurrently.
+
+    Tests assert over the cached results, so the suite waits for the slowest
+    Ollama round-trip instead of the sum of all of them.
+    """
+    from mcp_server.tools import medical_tool, medgemma_tool
+
+    await _warm_up_models(ollama_client)
+
+    return await _gather_results({
+        "extract_symptoms": medical_tool.run(
+            operation="extract_symptoms",
+            patient_message="I have a red itchy rash on my arm for 3 days",
+            language="en"
+        ),
+        "check_common_sense": medical_tool.run(
+            operation="check_common_sense",
+            symptom_description="itchy rash on forearm",
+            language="en"
+        ),
+        "analyze_image": medgemma_tool.run(
+            operation="analyze_image",
+            image_base64=sample_image_base64,
+            clinical_context="Patient reports itchy rash",
+            language="en"
+        ),
+    })
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def qdrant_tool_results(sample_image_base64, sample_image_batch):
+    """
+    Run every Qdrant-backed MCP tool call once, concurrently.
+
+    Kept separate from ``tool_results`` so ``-m "not requires_ollama"`` runs
+    the RAG tests without warming up or calling the Ollama models.
+    """
+    from mcp_server.tools import rag_tool, siglip_rag_tool
+
+    return await _gather_results({
+        "find_similar_cases": rag_tool.run(
+            operation="find_similar_cases",
+            symptoms=["rash", "itching"],
+            top_k=3
+        ),
+        "search_by_image": siglip_rag_tool.run(
+            operation="search_by_image",
+            image_base64=sample_image_base64,
+            top_k=3,
+            min_score=0.7
+        ),
+        "search_by_image_batch": siglip_rag_tool.run(
+            operation="search_by_image_batch",
+            images_base64=sample_image_batch,
+            top_k=3,
+            min_score=0.7
+        ),
+        # Per-image reference searches for the batch equivalence check
+        **{
+            f"search_by_image_{i}": siglip_rag_tool.run(
+                operation="search_by_image",
+                image_base64=image,
+                top_k=3,
+                min_score=0.7
+            )
+            for i, image in enumerate(sample_image_batch)
+        },
+    })
@@ -1,154 +1,103 @@
 """
 Comprehensive tests for all 7 MCP tools.
+
+Tool calls are issued concurrently by the session-scoped ``cpu_tool_results``,
+``tool_results`` (Ollama) and ``qdrant_tool_results`` fixtures (see
+``conftest.py``); each test asserts over its cached result. Classes are
+pinned to xdist groups: each group runs on a single worker, so each fixture
+is computed once, and the CPU-only tests run alongside the Ollama/Qdrant
+tests instead of competing with them for the GPU.
 """
 
 import pytest
-from unittest.mock import patch, AsyncMock
 
 
+@pytest.mark.xdist_group("cpu")
 class TestConsultationTool:
     """Tests for consultation_tool."""
 
-    @pytest.mark.asyncio
-    async def test_create_consultation(self):
+    def test_create_consultation(self, created_consultation):
         """Test creating a new consultation."""
-        from mcp_server.tools import consultation_tool
-
-        result = await consultation_tool.run(
-            operation="create",
-            patient_id="test_patient_123",
-            language="en"
-        )
+        result = created_consultation
 
         assert result["success"] is True
         assert "consultation_id" in result
         assert result["patient_id"] == "test_patient_123"
         assert result["language"] == "en"
 
-    @pytest.mark.asyncio
-    async def test_get_consultation(self):
+    def test_get_consultation(self, created_consultation, cpu_tool_results):
         """Test retrieving consultation details."""
-        from mcp_server.tools import consultation_tool
-
-        # First create
-        create_result = await consultation_tool.run(
-            operation="create",
-            patient_id="test_patient_456"
-        )
-
-        # Then retrieve
-        result = await consultation_tool.run(
-            operation="get",
-            consultation_id=create_result["consultation_id"]
-        )
+        result = cpu_tool_results["get_consultation"]
 
         assert result["success"] is True
-        assert result["consultation_id"] == create_result["consultation_id"]
+        assert result["consultation_id"] == created_consultation["consultation_id"]
 
 
+@pytest.mark.xdist_group("gpu_ollama")
 class TestMedicalTool:
     """Tests for medical_tool."""
 
-    @pytest.mark.asyncio
     @pytest.mark.requires_ollama
-    async def test_extract_symptoms(self):
+    def test_extract_symptoms(self, tool_results):
         """Test symptom extraction from patient message."""
-        from mcp_server.tools import medical_tool
-
-        result = await medical_tool.run(
-            operation="extract_symptoms",
-            patient_message="I have a red itchy rash on my arm for 3 days",
-            language="en"
-        )
+        result = tool_results["extract_symptoms"]
 
         assert result["success"] is True
         assert "symptoms" in result
         assert isinstance(result["symptoms"], list)
 
-    @pytest.mark.asyncio
     @pytest.mark.requires_ollama
-    async def test_common_sense_check(self):
+    def test_common_sense_check(self, tool_results):
         """Test common sense medical check."""
-        from mcp_server.tools import medical_tool
-
-        result = await medical_tool.run(
-            operation="check_common_sense",
-            symptom_description="itchy rash on forearm",
-            language="en"
-        )
+        result = tool_results["check_common_sense"]
 
         assert result["success"] is True
         assert "is_sensible" in result or "makes_sense" in result
 
 
+@pytest.mark.xdist_group("gpu_ollama")
 class TestMedGemmaTool:
     """Tests for medgemma_tool."""
 
-    @pytest.mark.asyncio
     @pytest.mark.requires_ollama
-    async def test_analyze_image(self, sample_image_base64):
+    def test_analyze_image(self, tool_results):
         """Test image analysis with MedGemma."""
-        from mcp_server.tools import medgemma_tool
-
-        result = await medgemma_tool.run(
-            operation="analyze_image",
-            image_base64=sample_image_base64,
-            clinical_context="Patient reports itchy rash",
-            language="en"
-        )
+        result = tool_results["analyze_image"]
 
         assert result["success"] is True
         assert "analysis" in result
         assert "predictions" in result["analysis"]
 
 
+@pytest.mark.xdist_group("gpu_ollama")
 class TestRAGTool:
     """Tests for rag_tool."""
 
-    @pytest.mark.asyncio
     @pytest.mark.requires_qdrant
-    async def test_find_similar_cases(self):
+    def test_find_similar_cases(self, qdrant_tool_results):
         """Test finding similar cases via RAG."""
-        from mcp_server.tools import rag_tool
-
-        result = await rag_tool.run(
-            operation="find_similar_cases",
-            symptoms=["rash", "itching"],
-            top_k=3
-        )
+        result = qdrant_tool_results["find_similar_cases"]
 
         assert result["success"] is True
         assert "similar_cases" in result
         assert isinstance(result["similar_cases"], list)
 
 
+@pytest.mark.xdist_group("cpu")
 class TestSafetyTool:
     """Tests for safety_tool."""
 
-    @pytest.mark.asyncio
-    async def test_check_message_safety(self):
+    def test_check_message_safety(self, cpu_tool_results):
         """Test message safety check."""
-        from mcp_server.tools import safety_tool
-
-        result = await safety_tool.run(
-            operation="check_message",
-            message="I have a mild rash",
-            language="en"
-        )
+        result = cpu_tool_results["check_message"]
 
         assert result["success"] is True
         assert "is_safe" in result
         assert "flags" in result
 
-    @pytest.mark.asyncio
-    async def test_check_condition_criticality(self):
+    def test_check_condition_criticality(self, cpu_tool_results):
         """Test condition criticality check."""
-        from mcp_server.tools import safety_tool
-
-        result = await safety_tool.run(
-            operation="check_critical",
-            conditions=["Contact Dermatitis", "Eczema"]
-        )
+        result = cpu_tool_results["check_critical"]
 
         assert result["success"] is True
         assert "is_critical" in result
@@ -156,40 +105,45 @@ class TestSafetyTool:
         assert "critical_conditions" in result
 
 
+@pytest.mark.xdist_group("gpu_ollama")
 class TestSigLIPRAGTool:
     """Tests for siglip_rag_tool."""
 
-    @pytest.mark.asyncio
     @pytest.mark.requires_qdrant
-    async def test_search_by_image(self, sample_image_base64):
+    def test_search_by_image(self, qdrant_tool_results):
         """Test image-based case search."""
-        from mcp_server.tools import siglip_rag_tool
-
-        result = await siglip_rag_tool.run(
-            operation="search_by_image",
-            image_base64=sample_image_base64,
-            top_k=3,
-            min_score=0.7
-        )
+        result = qdrant_tool_results["search_by_image"]
 
         assert result["success"] is True
         assert "similar_cases" in result
         assert result["embedding_model"] == "google/siglip-base-patch16-224"
 
+    @pytest.mark.requires_qdrant
+    def test_search_by_image_batch(self, qdrant_tool_results, sample_image_batch):
+        """Test batch result i matches search_by_image on image i."""
+        result = qdrant_tool_results["search_by_image_batch"]
 
+        assert result["success"] is True
+        assert len(result["results"]) == len(sample_image_batch)
+        for i, item in enumerate(result["results"]):
+            single = qdrant_tool_results[f"search_by_image_{i}"]
+            assert single["success"] is True
+            assert item["total_found"] == len(item["similar_cases"])
+            assert [c["case_id"] for c in item["similar_cases"]] == [
+                c["case_id"] for c in single["similar_cases"]
+            ]
+            assert [c["similarity_score"] for c in item["similar_cases"]] == pytest.approx(
+                [c["similarity_score"] for c in single["similar_cases"]], abs=1e-4
+            )
+
+
+@pytest.mark.xdist_group("cpu")
 class TestSpeechTool:
     """Tests for speech_tool."""
 
-    @pytest.mark.asyncio
-    async def test_synthesize_speech(self):
+    def test_synthesize_speech(self, cpu_tool_results):
         """Test text-to-speech synthesis."""
-        from mcp_server.tools import speech_tool
-
-        result = await speech_tool.run(
-            operation="synthesize",
-            text="Hello, how can I help you today?",
-            language="en"
-        )
+        result = cpu_tool_results["synthesize"]
 
         assert result["success"] is True
         assert "audio_base64" in result
@@ -0,0 +1,111 @@
+"""
+Unit tests for RAGService batched image search.
+
+Runs against an in-memory Qdrant collection with fixed embeddings, so no
+SigLIP model or Qdrant server is needed.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+
+# Each "image" maps straight to its embedding, skipping SigLIP
+EMBEDDINGS = {
+    "img_a": [1.0, 0.1, 0.0, 0.0],
+    "img_b": [0.0, 1.0, 0.1, 0.0],
+    "img_c": [0.0, 0.0, 1.0, 0.1],
+}
+
+CASES = [
+    (1, [1.0, 0.0, 0.0, 0.0], "Eczema"),
+    (2, [0.0, 1.0, 0.0, 0.0], "Psoriasis"),
+    (3, [0.0, 0.0, 1.0, 0.0], "Contact Dermatitis"),
+    (4, [0.5, 0.5, 0.0, 0.0], "Urticaria"),
+]
+
+
+class TestFindSimilarCasesByImages:
+    """Test cases for RAGService.find_similar_cases_by_images."""
+
+    @pytest.fixture
+    def rag_service(self):
+        """RAGService over an in-memory collection, with stubbed embeddings."""
+        from app.services.rag_service import RAGService
+
+        client = QdrantClient(":memory:")
+        client.create_collection(
+            collection_name="test_cases",
+            vectors_config=VectorParams(size=4, distance=Distance.COSINE)
+        )
+        client.upsert(
+            collection_name="test_cases",
+            points=[
+                PointStruct(
+                    id=case_id,
+                    vector=vector,
+                    payload={"condition": condition, "icd_code": "L30.9"}
+                )
+                for case_id, vector, condition in CASES
+            ]
+        )
+
+        # Skip __init__: it opens the configured Qdrant store
+        service = RAGService.__new__(RAGService)
+        service.client = client
+        service.collection_name = "test_cases"
+
+        async def embed(images):
+            return [EMBEDDINGS[image] for image in images]
+
+        service.generate_image_embeddings = AsyncMock(side_effect=embed)
+        return service
+
+    @pytest.mark.asyncio
+    async def test_matches_single_image_search(self, rag_service):
+        """Test result i equals find_similar_cases on image i, in input order."""
+        images = ["img_c", "img_a", "img_b"]
+
+        with patch.object(
+            rag_service.client,
+            "query_batch_points",
+            wraps=rag_service.client.query_batch_points
+        ) as batch_query:
+            batch = await rag_service.find_similar_cases_by_images(images, top_k=2)
+
+        batch_query.assert_called_once()
+        rag_service.generate_image_embeddings.assert_awaited_once_with(images)
+        assert len(batch) == len(images)
+
+        for image, cases in zip(images, batch):
+            single = await rag_service.find_similar_cases(image_base64=image, top_k=2)
+            assert [c.case_id for c in cases] == [c.case_id for c in single]
+            assert [c.similarity_score for c in cases] == pytest.approx(
+                [c.similarity_score for c in single]
+            )
+
+        assert [cases[0].condition for cases in batch] == [
+            "Contact Dermatitis", "Eczema", "Psoriasis"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_empty_input(self, rag_service):
+        """Test no images returns no results without querying Qdrant."""
+        with patch.object(rag_service.client, "query_batch_points") as batch_query:
+            assert await rag_service.find_similar_cases_by_images([]) == []
+
+        batch_query.assert_not_called()
+        rag_service.generate_image_embeddings.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_query_error_returns_empty_lists(self, rag_service):
+        """Test a failed batch query yields one empty list per image."""
+        with patch.object(
+            rag_service.client,
+            "query_batch_points",
+            side_effect=RuntimeError("qdrant unavailable")
+        ):
+            batch = await rag_service.find_similar_cases_by_images(["img_a", "img_b"])
+
+        assert batch == [[], []]
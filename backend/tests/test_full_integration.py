@@ -10,168 +10,256 @@ Usage:
 """
 
 import asyncio
-import requests
+import sys
+from pathlib import Path
+
+import httpx
 import json
+import pytest
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tests._buffered_log import BufferedLog
+
+# Optional faster JSON encode/decode; falls back to the stdlib
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 BACKEND_URL = "http://localhost:8000"
 
+# Fields shared by every /agent/message request in the conversation
+BASE_PAYLOAD = {"patient_id": "integration-test-001", "language": "en"}
+
+# Output is batched and written once per step
+log = BufferedLog()
+
+
+if HAS_ORJSON:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def pretty(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+    def pretty(obj) -> str:
+        return json.dumps(obj, indent=2)
+
+    loads = json.loads
+
+
+def make_client() -> httpx.AsyncClient:
+    """Create a keep-alive client so every step reuses one pooled connection."""
+    return httpx.AsyncClient(
+        base_url=BACKEND_URL,
+        headers={"Content-Type": "application/json"},
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4),
+        timeout=60.0,
+    )
 
-def test_full_conversation():
+
+async def post_json(client: httpx.AsyncClient, url: str, payload: dict):
+    """
+    POST payload and parse the JSON reply.
+
+    Returns (response, data); data is None for an error status, in which case
+    response.text holds the body.
+    """
+    response = await client.post(url, content=dumps(payload))
+    if response.is_error:
+        return response, None
+    return response, loads(response.content)
+
+
+async def run_full_conversation(client: httpx.AsyncClient) -> bool:
+    """Drive a full conversation through the API; False on the first failed step."""
+    # Flush on every exit so a failing step's lines land in pytest's
+    # captured output rather than at interpreter exit
+    try:
+        log("\n" + "="*70)
+        log(" FULL INTEGRATION TEST - Frontend → Backend → SOAP Agent")
+        log("="*70)
+
+        consultation_id = None
+
+        # Step 1: Greeting
+        log.flush()
+        log("\n" + "-"*70)
+        log("STEP 1: Initial Greeting")
+        log("-"*70)
+
+        payload1 = {"message": "Hello, I need help with my skin", **BASE_PAYLOAD}
+
+        log(f"📤 POST {BACKEND_URL}/agent/message")
+        log(f"   Payload: {pretty(payload1)}")
+
+        response1, data1 = await post_json(client, "/agent/message", payload1)
+
+        if response1.status_code != 200:
+            log(f"❌ Request failed: {response1.status_code}")
+            log(f"   Error: {response1.text}")
+            return False
+
+        consultation_id = data1.get("consultation_id")
+
+        log(f"\n📥 Response ({response1.status_code}):")
+        log(f"   ✅ Success: {data1['success']}")
+        log(f"   Stage: {data1['current_stage']}")
+        log(f"   Consultation ID: {consultation_id}")
+        log(f"   Message: {data1['message'][:150]}...")
+
+        if data1['current_stage'] != "GREETING":
+            log(f"❌ Expected GREETING stage")
+            return False
+
+        # Step 2: Give Consent
+        log.flush()
+        log("\n" + "-"*70)
+        log("STEP 2: Give Consent")
+        log("-"*70)
+
+        payload2 = {
+            "message": "Yes, I agree",
+            "consultation_id": consultation_id,
+            **BASE_PAYLOAD,
+        }
+
+        log(f"📤 POST {BACKEND_URL}/agent/message")
+        response2, data2 = await post_json(client, "/agent/message", payload2)
+
+        log(f"\n📥 Response ({response2.status_code}):")
+        log(f"   Stage: {data2['current_stage']}")
+        log(f"   Message: {data2['message'][:150]}...")
+
+        if data2['current_stage'] != "SUBJECTIVE":
+            log(f"⚠️  Expected SUBJECTIVE stage, got {data2['current_stage']}")
+
+        # Step 3: Describe Symptoms
+        log.flush()
+        log("\n" + "-"*70)
+        log("STEP 3: Describe Symptoms")
+        log("-"*70)
+
+        payload3 = {
+            "message": "I have a red, itchy rash on my arm for 3 days. It's getting worse and painful.",
+            "consultation_id": consultation_id,
+            **BASE_PAYLOAD,
+        }
+
+        log(f"📤 POST {BACKEND_URL}/agent/message")
+        response3, data3 = await post_json(client, "/agent/message", payload3)
+
+        log(f"\n📥 Response ({response3.status_code}):")
+        log(f"   Stage: {data3['current_stage']}")
+        log(f"   Message: {data3['message'][:150]}...")
+        log(f"   Requires Image: {data3.get('requires_image', False)}")
+
+        # Step 4: Get Consultation State
+        log.flush()
+        log("\n" + "-"*70)
+        log("STEP 4: Get Consultation State")
+        log("-"*70)
+
+        # The state read and the health probe are independent; issue them together
+        log(f"📤 GET {BACKEND_URL}/agent/consultation/{consultation_id}")
+        log(f"📤 GET {BACKEND_URL}/agent/health")
+        response4, health_response = await asyncio.gather(
+            client.get(f"/agent/consultation/{consultation_id}"),
+            client.get("/agent/health"),
+        )
+        state = loads(response4.content)
+
+        log(f"\n📥 Consultation State:")
+        log(f"   Stage: {state['current_stage']}")
+        log(f"   Consent: {state['consent_given']}")
+        log(f"   Symptoms: {state['extracted_symptoms']}")
+        log(f"   Messages: {state['message_history_count']}")
+
+        print_health(loads(health_response.content))
+
+        # Summary
+        log.flush()
+        log("\n" + "="*70)
+        log(" INTEGRATION TEST SUMMARY")
+        log("="*70)
+
+        log(f"\n✅ Successfully tested:")
+        log(f"   • Agent message endpoint (POST /agent/message)")
+        log(f"   • Conversation state management")
+        log(f"   • SOAP workflow progression (GREETING → SUBJECTIVE → OBJECTIVE)")
+        log(f"   • Symptom extraction")
+        log(f"   • Consultation state retrieval (GET /agent/consultation/{{id}})")
+
+        log(f"\n🎉 Frontend ↔ Backend integration working perfectly!")
+
+        return True
+    finally:
+        log.flush()
+
+
+@pytest.mark.asyncio
+async def test_full_conversation():
     """Test a full conversation flow through the API."""
+    async with make_client() as client:
+        assert await run_full_conversation(client)
+
 
-    print("\n" + "="*70)
-    print(" FULL INTEGRATION TEST - Frontend → Backend → SOAP Agent")
-    print("="*70)
-
-    consultation_id = None
-
-    # Step 1: Greeting
-    print("\n" + "-"*70)
-    print("STEP 1: Initial Greeting")
-    print("-"*70)
-
-    payload1 = {
-        "message": "Hello, I need help with my skin",
-        "patient_id": "integration-test-001",
-        "language": "en"
-    }
-
-    print(f"📤 POST {BACKEND_URL}/agent/message")
-    print(f"   Payload: {json.dumps(payload1, indent=2)}")
-
-    response1 = requests.post(f"{BACKEND_URL}/agent/message", json=payload1)
-
-    if response1.status_code != 200:
-        print(f"❌ Request failed: {response1.status_code}")
-        print(f"   Error: {response1.text}")
-        return False
-
-    data1 = response1.json()
-    consultation_id = data1.get("consultation_id")
-
-    print(f"\n📥 Response ({response1.status_code}):")
-    print(f"   ✅ Success: {data1['success']}")
-    print(f"   Stage: {data1['current_stage']}")
-    print(f"   Consultation ID: {consultation_id}")
-    print(f"   Message: {data1['message'][:150]}...")
-
-    if data1['current_stage'] != "GREETING":
-        print(f"❌ Expected GREETING stage")
-        return False
-
-    # Step 2: Give Consent
-    print("\n" + "-"*70)
-    print("STEP 2: Give Consent")
-    print("-"*70)
-
-    payload2 = {
-        "message": "Yes, I agree",
-        "consultation_id": consultation_id,
-        "patient_id": "integration-test-001",
-        "language": "en"
-    }
-
-    print(f"📤 POST {BACKEND_URL}/agent/message")
-    response2 = requests.post(f"{BACKEND_URL}/agent/message", json=payload2)
-    data2 = response2.json()
-
-    print(f"\n📥 Response ({response2.status_code}):")
-    print(f"   Stage: {data2['current_stage']}")
-    print(f"   Message: {data2['message'][:150]}...")
-
-    if data2['current_stage'] != "SUBJECTIVE":
-        print(f"⚠️  Expected SUBJECTIVE stage, got {data2['current_stage']}")
-
-    # Step 3: Describe Symptoms
-    print("\n" + "-"*70)
-    print("STEP 3: Describe Symptoms")
-    print("-"*70)
-
-    payload3 = {
-        "message": "I have a red, itchy rash on my arm for 3 days. It's getting worse and painful.",
-        "consultation_id": consultation_id,
-        "patient_id": "integration-test-001",
-        "language": "en"
-    }
-
-    print(f"📤 POST {BACKEND_URL}/agent/message")
-    response3 = requests.post(f"{BACKEND_URL}/agent/message", json=payload3)
-    data3 = response3.json()
-
-    print(f"\n📥 Response ({response3.status_code}):")
-    print(f"   Stage: {data3['current_stage']}")
-    print(f"   Message: {data3['message'][:150]}...")
-    print(f"   Requires Image: {data3.get('requires_image', False)}")
-
-    # Step 4: Get Consultation State
-    print("\n" + "-"*70)
-    print("STEP 4: Get Consultation State")
-    print("-"*70)
-
-    print(f"📤 GET {BACKEND_URL}/agent/consultation/{consultation_id}")
-    response4 = requests.get(f"{BACKEND_URL}/agent/consultation/{consultation_id}")
-    state = response4.json()
-
-    print(f"\n📥 Consultation State:")
-    print(f"   Stage: {state['current_stage']}")
-    print(f"   Consent: {state['consent_given']}")
-    print(f"   Symptoms: {state['extracted_symptoms']}")
-    print(f"   Messages: {state['message_history_count']}")
-
-    # Summary
-    print("\n" + "="*70)
-    print(" INTEGRATION TEST SUMMARY")
-    print("="*70)
-
-    print(f"\n✅ Successfully tested:")
-    print(f"   • Agent message endpoint (POST /agent/message)")
-    print(f"   • Conversation state management")
-    print(f"   • SOAP workflow progression (GREETING → SUBJECTIVE → OBJECTIVE)")
-    print(f"   • Symptom extraction")
-    print(f"   • Consultation state retrieval (GET /agent/consultation/{{id}})")
-
-    print(f"\n🎉 Frontend ↔ Backend integration working perfectly!")
-
-    return True
-
-
-def test_agent_health():
+@pytest.mark.asyncio
+async def test_agent_health():
     """Test agent health endpoint."""
-    print("\n" + "-"*70)
-    print("BONUS: Agent Health Check")
-    print("-"*70)
+    async with make_client() as client:
+        response = await client.get("/agent/health")
+    assert response.status_code == 200
+    health = loads(response.content)
+    print_health(health)
+    log.flush()
+    assert health["status"] == "healthy"
 
-    response = requests.get(f"{BACKEND_URL}/agent/health")
-    health = response.json()
 
-    print(f"📥 Health Status:")
-    print(f"   Status: {health['status']}")
-    print(f"   Agent Type: {health['agent_type']}")
-    print(f"   Active Consultations: {health['active_consultations']}")
-    print(f"   Tools Count: {health['tools_count']}")
+def print_health(health: dict):
+    """Print the agent health check response."""
+    log.flush()
+    log("\n" + "-"*70)
+    log("BONUS: Agent Health Check")
+    log("-"*70)
 
+    log(f"📥 Health Status:")
+    log(f"   Status: {health['status']}")
+    log(f"   Agent Type: {health['agent_type']}")
+    log(f"   Active Consultations: {health['active_consultations']}")
+    log(f"   Tools Count: {health['tools_count']}")
 
-if __name__ == "__main__":
-    print("\n🔧 Testing Full Integration: Frontend API → Backend → SOAP Agent\n")
 
-    try:
-        # Test health first
-        test_agent_health()
+async def main():
+    """Run the full conversation test; it includes the health check."""
+    log("\n🔧 Testing Full Integration: Frontend API → Backend → SOAP Agent\n")
 
-        # Run full conversation test
-        success = test_full_conversation()
+    try:
+        async with make_client() as client:
+            success = await run_full_conversation(client)
 
         if success:
-            print("\n✅ All integration tests passed!")
+            log("\n✅ All integration tests passed!")
         else:
-            print("\n⚠️  Some tests failed")
+            log("\n⚠️  Some tests failed")
 
-    except requests.exceptions.ConnectionError:
-        print("\n❌ Connection Error!")
-        print("   Make sure backend is running on http://localhost:8000")
-        print("   Start with: cd backend && uvicorn main:app --reload")
+    except httpx.ConnectError:
+        log("\n❌ Connection Error!")
+        log("   Make sure backend is running on http://localhost:8000")
+        log("   Start with: cd backend && uvicorn main:app --reload")
 
-    except Exception as e:
-        print(f"\n❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
+    finally:
+        # Anything else propagates to asyncio.run; flush output before its traceback
+        log.flush()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
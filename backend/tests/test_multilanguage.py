@@ -14,185 +14,265 @@ Usage:
 """
 
 import asyncio
+import copy
+import dataclasses
+import functools
+import io
+import logging
 import os
 import sys
+from typing import TYPE_CHECKING, Optional, Tuple
+
 from dotenv import load_dotenv
 
-# Add backend directory to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Optional faster event loop for the script entry point
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
+if TYPE_CHECKING:
+    from agent.soap_agent import SOAPAgent
+
+logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+_SEP_70 = "=" * 70
 
-from agent.soap_agent import SOAPAgent
+
+@dataclasses.dataclass(frozen=True)
+class LangCase:
+    """One language's three-turn consultation; the code doubles as its name."""
+    code: str
+    greeting: str
+    consent: str
+    symptoms: str
 
 
 # Test messages in different languages
-TEST_MESSAGES = {
-    "en": {
-        "greeting": "Hello, I need help",
-        "consent": "Yes, I agree",
-        "symptoms": "I have a red, itchy rash on my arm for 3 days",
-        "language_code": "en"
-    },
-    "hi": {
-        "greeting": "नमस्ते, मुझे मदद चाहिए",
-        "consent": "हां, मैं सहमत हूं",
-        "symptoms": "मेरे हाथ पर 3 दिन से लाल और खुजली वाला दाने है",
-        "language_code": "hi"
-    },
-    "ta": {
-        "greeting": "வணக்கம், எனக்கு உதவி வேண்டும்",
-        "consent": "ஆம், நான் சம்மதிக்கிறேன்",
-        "symptoms": "என் கையில் 3 நாட்களாக சிவப்பு, அரிப்பு சொறி உள்ளது",
-        "language_code": "ta"
-    },
-    "te": {
-        "greeting": "నమస్కారం, నాకు సహాయం కావాలి",
-        "consent": "అవును, నేను అంగీకరిస్తున్నాను",
-        "symptoms": "నా చేతిపై 3 రోజులుగా ఎరుపు, దురద పొక్కులు ఉన్నాయి",
-        "language_code": "te"
-    },
-    "bn": {
-        "greeting": "হ্যালো, আমার সাহায্য দরকার",
-        "consent": "হ্যাঁ, আমি সম্মত",
-        "symptoms": "আমার হাতে 3 দিন ধরে লাল, চুলকানি ফুসকুড়ি আছে",
-        "language_code": "bn"
-    }
-}
-
-
-async def test_language(language: str, messages: dict):
-    """Test agent with specific language."""
+TEST_CASES: Tuple[LangCase, ...] = (
+    LangCase(
+        "en",
+        greeting="Hello, I need help",
+        consent="Yes, I agree",
+        symptoms="I have a red, itchy rash on my arm for 3 days",
+    ),
+    LangCase(
+        "hi",
+        greeting="नमस्ते, मुझे मदद चाहिए",
+        consent="हां, मैं सहमत हूं",
+        symptoms="मेरे हाथ पर 3 दिन से लाल और खुजली वाला दाने है",
+    ),
+    LangCase(
+        "ta",
+        greeting="வணக்கம், எனக்கு உதவி வேண்டும்",
+        consent="ஆம், நான் சம்மதிக்கிறேன்",
+        symptoms="என் கையில் 3 நாட்களாக சிவப்பு, அரிப்பு சொறி உள்ளது",
+    ),
+    LangCase(
+        "te",
+        greeting="నమస్కారం, నాకు సహాయం కావాలి",
+        consent="అవును, నేను అంగీకరిస్తున్నాను",
+        symptoms="నా చేతిపై 3 రోజులుగా ఎరుపు, దురద పొక్కులు ఉన్నాయి",
+    ),
+    LangCase(
+        "bn",
+        greeting="হ্যালো, আমার সাহায্য দরকার",
+        consent="হ্যাঁ, আমি সম্মত",
+        symptoms="আমার হাতে 3 দিন ধরে লাল, চুলকানি ফুসকুড়ি আছে",
+    ),
+)
+
+
+def _bootstrap():
+    """Script-only setup: make the backend importable and load .env."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    load_dotenv()
+
+
+@functools.lru_cache(maxsize=1)
+def _agent() -> "SOAPAgent":
+    """Shared agent: the Gemini client (and its HTTP pool) is built once per run."""
+    from agent.soap_agent import SOAPAgent
+
+    return SOAPAgent()
+
+
+def new_agent() -> "SOAPAgent":
+    """
+    Return an agent with its own consultation state.
+
+    The copy shares the Gemini client and MCP tools with the cached agent, so
+    the concurrent language conversations don't race on ``agent.state``.
+    """
+    from agent.soap_agent import ConsultationState
+
+    agent = copy.copy(_agent())
+    agent.state = ConsultationState()
+    return agent
+
+
+@dataclasses.dataclass(frozen=True)
+class TurnResult:
+    """The fields of one process_message response that the test reports on."""
+    message: Optional[str]
+    stage: str
+    success: bool
+    error: str
+
+    @classmethod
+    def from_response(cls, response: dict) -> "TurnResult":
+        return cls(
+            message=response.get('message'),
+            stage=response.get('stage', 'UNKNOWN'),
+            success=response.get('success', False),
+            error=response.get('error', 'Unknown'),
+        )
 
-    print("\n" + "="*70)
-    print(f" TESTING: {language.upper()} ({messages['language_code']})")
-    print("="*70)
 
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key or api_key == "your_api_key_here":
-        print("❌ GOOGLE_API_KEY not set!")
-        return False
+def log_turn(log, language: str, patient_message: str, result: TurnResult):
+    """Log one patient message and the agent's reply."""
+    log(f"\n📤 Patient ({language}): {patient_message}")
+    if result.message is not None:
+        log(f"📥 Agent: {result.message[:150]}...")
+    else:
+        log(f"📥 Agent: [No message - Error: {result.error}]")
+    log(f"   Stage: {result.stage}")
 
-    try:
-        agent = SOAPAgent()
-        patient_id = f"test-{language}-001"
-        lang_code = messages['language_code']
 
-        # Test 1: Greeting
-        print(f"\n📤 Patient ({language}): {messages['greeting']}")
-        response1 = await agent.process_message(
-            messages['greeting'],
-            patient_id=patient_id,
-            language=lang_code
-        )
+async def test_language(case: LangCase):
+    """Test agent with specific language."""
+    # Languages run concurrently; buffer this one's output and log it as a
+    # single record at the end so the transcripts don't interleave
+    out = io.StringIO()
+    try:
+        return await _run_language(case, out)
+    finally:
+        logger.info("%s", out.getvalue().rstrip("\n"))
 
-        if 'message' in response1:
-            print(f"📥 Agent: {response1['message'][:150]}...")
-        else:
-            print(f"📥 Agent: [No message - Error: {response1.get('error', 'Unknown')}]")
 
-        print(f"   Stage: {response1.get('stage', 'UNKNOWN')}")
-        print(f"   Success: {response1.get('success', False)}")
+async def _run_language(case: LangCase, out: io.StringIO) -> bool:
+    """Run the three-turn conversation for one language, logging to out."""
+    log = functools.partial(print, file=out)
 
-        if not response1.get('success', False):
-            print(f"❌ Greeting failed: {response1.get('error', 'Unknown error')}")
-            return False
+    log("\n" + _SEP_70)
+    log(f" TESTING: {case.code.upper()} ({case.code})")
+    log(_SEP_70)
 
-        # Test 2: Consent
-        print(f"\n📤 Patient ({language}): {messages['consent']}")
-        response2 = await agent.process_message(
-            messages['consent'],
+    try:
+        agent = new_agent()
+        patient_id = f"test-{case.code}-001"
+
+        # The three turns run back to back on one consultation; a failed
+        # turn ends the batch early
+        turns = [case.greeting, case.consent, case.symptoms]
+        responses = await agent.process_turns(
+            turns,
             patient_id=patient_id,
-            language=lang_code
+            language=case.code
         )
 
-        if 'message' in response2:
-            print(f"📥 Agent: {response2['message'][:150]}...")
-        else:
-            print(f"📥 Agent: [No message - Error: {response2.get('error', 'Unknown')}]")
+        # Test 1: Greeting
+        greeting = TurnResult.from_response(responses[0])
+        log_turn(log, case.code, case.greeting, greeting)
+        log(f"   Success: {greeting.success}")
 
-        print(f"   Stage: {response2.get('stage', 'UNKNOWN')}")
-        print(f"   Consent given: {agent.state.consent_given}")
+        if not greeting.success:
+            log(f"❌ Greeting failed: {greeting.error or 'Unknown error'}")
+            return False
 
-        if response2.get('stage') != "SUBJECTIVE":
-            print(f"⚠️  Expected SUBJECTIVE stage, got {response2.get('stage', 'UNKNOWN')}")
+        # Test 2: Consent
+        consent = TurnResult.from_response(responses[1])
+        log_turn(log, case.code, case.consent, consent)
+        log(f"   Consent given: {agent.state.consent_given}")
 
-        # Test 3: Symptom extraction
-        print(f"\n📤 Patient ({language}): {messages['symptoms']}")
-        response3 = await agent.process_message(
-            messages['symptoms'],
-            patient_id=patient_id,
-            language=lang_code
-        )
+        if consent.stage != "SUBJECTIVE":
+            log(f"⚠️  Expected SUBJECTIVE stage, got {consent.stage}")
 
-        if 'message' in response3:
-            print(f"📥 Agent: {response3['message'][:150]}...")
-        else:
-            print(f"📥 Agent: [No message - Error: {response3.get('error', 'Unknown')}]")
+        if len(responses) < 3:
+            log(f"❌ Consent failed: {consent.error or 'Unknown error'}")
+            return False
 
-        print(f"   Stage: {response3.get('stage', 'UNKNOWN')}")
-        print(f"   Extracted symptoms: {response3.get('extracted_symptoms', [])}")
-        print(f"   Function calls: {[fc['name'] for fc in response3.get('function_calls', [])]}")
+        # Test 3: Symptom extraction
+        response3 = responses[2]
+        symptoms = TurnResult.from_response(response3)
+        extracted = response3.get('extracted_symptoms', [])
+        log_turn(log, case.code, case.symptoms, symptoms)
+        log(f"   Extracted symptoms: {extracted}")
+        log(f"   Function calls: {[fc['name'] for fc in response3.get('function_calls', [])]}")
 
         # Check if symptoms were extracted
-        success = len(response3.get('extracted_symptoms', [])) > 0
+        success = len(extracted) > 0
 
         if success:
-            print(f"\n✅ {language.upper()}: All tests passed")
+            log(f"\n✅ {case.code.upper()}: All tests passed")
         else:
-            print(f"\n⚠️  {language.upper()}: Symptom extraction failed")
+            log(f"\n⚠️  {case.code.upper()}: Symptom extraction failed")
 
         return success
 
     except Exception as e:
-        print(f"\n❌ Error testing {language}: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"\n❌ Error testing {case.code}: {e}")
+        # The traceback is only formatted when DEBUG logging is on
+        logger.debug("Error testing %s", case.code, exc_info=True)
         return False
 
 
 async def main():
     """Run multi-language tests."""
 
-    print("\n" + "="*70)
-    print(" MULTI-LANGUAGE SUPPORT TEST SUITE")
-    print("="*70)
-    print("\nTesting Gemini 2.0's ability to handle medical consultations in:")
-    print("- English (en)")
-    print("- Hindi (hi)")
-    print("- Tamil (ta)")
-    print("- Telugu (te)")
-    print("- Bengali (bn)")
+    logger.info("\n%s\n MULTI-LANGUAGE SUPPORT TEST SUITE\n%s", _SEP_70, _SEP_70)
+    logger.info("\nTesting Gemini 2.0's ability to handle medical consultations in:")
+    logger.info("- English (en)")
+    logger.info("- Hindi (hi)")
+    logger.info("- Tamil (ta)")
+    logger.info("- Telugu (te)")
+    logger.info("- Bengali (bn)")
 
-    results = {}
-
-    # Test each language
-    for language, messages in TEST_MESSAGES.items():
-        results[language] = await test_language(language, messages)
+    # Every language needs Gemini; stop once here rather than fail five times
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key or api_key == "your_api_key_here":
+        logger.info("\n❌ GOOGLE_API_KEY not set!")
+        return
+
+    # Languages are independent conversations; run them concurrently
+    outcomes = await asyncio.gather(
+        *(test_language(case) for case in TEST_CASES),
+        return_exceptions=True,
+    )
+    # One row per language: (code, passed); an exception is a failure
+    rows = [(case.code, outcome is True) for case, outcome in zip(TEST_CASES, outcomes)]
+    passed = sum(ok for _, ok in rows)
+    total = len(rows)
 
     # Summary
-    print("\n" + "="*70)
-    print(" TEST SUMMARY")
-    print("="*70)
-
-    passed = sum(1 for success in results.values() if success)
-    total = len(results)
+    logger.info("\n%s\n TEST SUMMARY\n%s", _SEP_70, _SEP_70)
 
-    for language, success in results.items():
-        status = "✅ PASS" if success else "❌ FAIL"
-        print(f"{status} - {language.upper()} ({TEST_MESSAGES[language]['language_code']})")
+    for code, ok in rows:
+        status = "✅ PASS" if ok else "❌ FAIL"
+        logger.info("%s - %s (%s)", status, code.upper(), code)
 
-    print(f"\nTotal: {passed}/{total} languages tested successfully ({passed/total*100:.0f}%)")
+    logger.info(
+        "\nTotal: %d/%d languages tested successfully (%.0f%%)",
+        passed, total, passed / total * 100,
+    )
 
     if passed == total:
-        print("\n🎉 All languages supported!")
+        logger.info("\n🎉 All languages supported!")
     else:
-        print(f"\n⚠️  {total - passed} language(s) need attention")
+        logger.info("\n⚠️  %d language(s) need attention", total - passed)
 
-    print("\n💡 Note: Gemini 2.0 Flash has strong multilingual capabilities")
-    print("   The agent should respond appropriately in the user's language")
+    logger.info("\n💡 Note: Gemini 2.0 Flash has strong multilingual capabilities")
+    logger.info("   The agent should respond appropriately in the user's language")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    _bootstrap()
+    from tests._buffered_log import configure_queue_logging
+
+    # Console writes happen on the listener thread, off the event loop.
+    # DEBUG=1 adds tracebacks for failed languages
+    debug = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+    configure_queue_logging(logging.DEBUG if debug else logging.INFO)
+    run = uvloop.run if HAS_UVLOOP else asyncio.run
+    run(main())